@@ -1,8 +1,18 @@
 import os
-import shutil
 import re
+import copy
+import io
+import zipfile
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from functools import lru_cache
+from xml.sax.saxutils import escape as xml_escape
 from docx import Document
+from docx.oxml.ns import qn
 from openpyxl import load_workbook
 import tkinter as tk
 from tkinter import ttk, messagebox
@@ -11,6 +21,9 @@ from tkinter import ttk, messagebox
 
 CONFIG_FILE = "input.txt"
 OUTPUT_DIRNAME = "certificates"  # fixed
+# Deflate level for generated .docx files. 1 takes far less CPU than zlib's default (6);
+# files come out larger (~40% for a text-only template), still only tens of KB
+ZIP_COMPRESSLEVEL = 1
 
 # Read Excel filename, Word template filename, optional image, optional caption
 if not os.path.exists(CONFIG_FILE):
@@ -41,61 +54,56 @@ image_path = os.path.join(current_directory, IMAGE_FILENAME) if IMAGE_FILENAME e
 # ---------------- HELPERS ----------------
 PLACEHOLDER_RE = re.compile(r'\{\s*([^}]+?)\s*\}')
 
+# "1st June 2024", "30 Jul 2024", ...
+_DATE_RE = re.compile(r'^\s*(\d{1,2})\s*(?:st|nd|rd|th)?\s+([A-Za-z]+)\s+(\d{4})\s*$', re.I)
+_MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+                "august", "september", "october", "november", "december"]
+_MONTHS = {name[:n]: i for i, name in enumerate(_MONTH_NAMES, start=1) for n in (3, len(name))}
+
+@lru_cache(maxsize=4096)
+def _format_date(day, month, year):
+    # Cached: most rows share a handful of start/end dates
+    month_no = _MONTHS.get(month.lower())
+    if month_no:
+        try:
+            return datetime(int(year), month_no, int(day)).strftime("%d-%b-%Y")
+        except ValueError:
+            pass
+    return None
+
 def format_value(val):
     if val is None:
         return ""
     if isinstance(val, datetime):
         return val.strftime("%d-%b-%Y")
     if isinstance(val, str):
-        cleaned = val.strip()
-        try:
-            c = (cleaned.replace("st","").replace("nd","")
-                        .replace("rd","").replace("th",""))
-            parsed = datetime.strptime(c.strip(), "%d %B %Y")
-            return parsed.strftime("%d-%b-%Y")
-        except:
-            try:
-                c = (cleaned.replace("st","").replace("nd","")
-                            .replace("rd","").replace("th",""))
-                parsed = datetime.strptime(c.strip(), "%d %b %Y")
-                return parsed.strftime("%d-%b-%Y")
-            except:
-                return cleaned
+        m = _DATE_RE.match(val)
+        if m:
+            formatted = _format_date(*m.groups())
+            if formatted:
+                return formatted
+        return val.strip()
     return str(val)
 
 def copy_formatting(target_run, source_run):
-    try: target_run.bold = source_run.bold
-    except: pass
-    try: target_run.italic = source_run.italic
-    except: pass
-    try: target_run.underline = source_run.underline
-    except: pass
-    try:
-        if source_run.font.name:
-            target_run.font.name = source_run.font.name
-    except: pass
-    try:
-        if source_run.font.size:
-            target_run.font.size = source_run.font.size
-    except: pass
-    try:
-        if source_run.font.color and source_run.font.color.rgb:
-            target_run.font.color.rgb = source_run.font.color.rgb
-    except: pass
+    # Clone the whole <w:rPr> in one go instead of going property by property
+    src_rPr = source_run._r.find(qn("w:rPr"))
+    if src_rPr is not None:
+        old = target_run._r.find(qn("w:rPr"))
+        if old is not None:
+            target_run._r.remove(old)
+        target_run._r.insert(0, copy.deepcopy(src_rPr))
 
 def replace_placeholders_in_paragraph(paragraph, mapping):
-    if not paragraph.runs:
-        return
-    full_text = ''.join(run.text for run in paragraph.runs)
-    if "{" not in full_text:
+    # paragraph.runs is an XPath query each time, so take it once; most paragraphs have no "{"
+    runs = paragraph.runs
+    if not any("{" in run.text for run in runs):
         return
+    texts = [run.text for run in runs]
+    full_text = ''.join(texts)
     matches = list(PLACEHOLDER_RE.finditer(full_text))
     if not matches:
         return
-    run_map = []
-    for idx, run in enumerate(paragraph.runs):
-        text = run.text or ""
-        run_map.extend([idx] * len(text))
     segments = []
     last = 0
     for m in matches:
@@ -110,14 +118,15 @@ def replace_placeholders_in_paragraph(paragraph, mapping):
         last = e
     if last < len(full_text):
         segments.append(("text", full_text[last:], last))
-    for run in paragraph.runs:
+    for run in runs:
         run.text = ""
+    src_idx, run_end = 0, len(texts[0])
     for seg_type, seg_text, seg_pos in segments:
-        if run_map:
-            src_idx = run_map[min(seg_pos, len(run_map) - 1)]
-            src_run = paragraph.runs[src_idx]
-        else:
-            src_run = None
+        pos = min(seg_pos, len(full_text) - 1)
+        while pos >= run_end:
+            src_idx += 1
+            run_end += len(texts[src_idx])
+        src_run = runs[src_idx]
         new_run = paragraph.add_run(seg_text)
         if src_run:
             copy_formatting(new_run, src_run)
@@ -134,7 +143,8 @@ def process_document(doc, mapping):
                     replace_placeholders_in_paragraph(p, mapping)
     for section in doc.sections:
         for container in (section.header, section.footer):
-            if container:
+            # Linked means no part of its own: reading it would create an empty one per document
+            if not container.is_linked_to_previous:
                 for p in container.paragraphs:
                     replace_placeholders_in_paragraph(p, mapping)
                 for table in container.tables:
@@ -143,51 +153,162 @@ def process_document(doc, mapping):
                             for p in cell.paragraphs:
                                 replace_placeholders_in_paragraph(p, mapping)
 
-# ---------------- DATA LOADING ----------------
-wb = load_workbook(excel_path, data_only=True)
-sheet = wb.active
-headers = [str(cell.value).strip() if cell.value else "" for cell in sheet[1]]
+# Private-use code points that mark value slots in the precompiled template
+_MARK_OPEN, _MARK_CLOSE = "\ue000", "\ue001"
+_MARK_RE = re.compile(re.escape(_MARK_OPEN.encode()) + rb"(\d+)" + re.escape(_MARK_CLOSE.encode()))
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _xml_text(value):
+    """Escape a value for a <w:t> slot; tabs and line breaks become <w:tab/>/<w:br/> like python-docx does."""
+    text = xml_escape(_XML_INVALID_RE.sub("", value))
+    if "\t" in text or "\n" in text or "\r" in text:
+        text = (text.replace("\t", '</w:t><w:tab/><w:t xml:space="preserve">')
+                    .replace("\r", '</w:t><w:br/><w:t xml:space="preserve">')
+                    .replace("\n", '</w:t><w:br/><w:t xml:space="preserve">'))
+    return text.encode("utf-8")
+
+def compile_template(template_bytes, keys):
+    """Fill the template once with slot markers instead of values.
+
+    Returns (keys, parts): the keys the template actually uses, and a list of
+    (ZipInfo, data) where data is either the member bytes or, for members holding
+    placeholders, a (format, slots) pair: the member as a bytes %-format and the
+    index into keys for each %s. Rendering a row is then one % plus a zip write,
+    with no XML parsing.
+    Returns None if the template itself contains the marker characters.
+    """
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as zin:
+        if any(_MARK_OPEN.encode() in zin.read(info) for info in zin.infolist()):
+            return None
+    doc = Document(io.BytesIO(template_bytes))
+    process_document(doc, {key: f"{_MARK_OPEN}{i}{_MARK_CLOSE}" for i, key in enumerate(keys)})
+    buf = io.BytesIO()
+    doc.save(buf)
+
+    parts = []
+    used = {}
+    with zipfile.ZipFile(buf) as zin:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if _MARK_OPEN.encode() in data:
+                pieces = _MARK_RE.split(data.replace(b"<w:t>" + _MARK_OPEN.encode(),
+                                                     b'<w:t xml:space="preserve">' + _MARK_OPEN.encode()))
+                # Literal XML becomes a %-format (its own % doubled) with a %s per slot;
+                # slots are renumbered so only keys the template uses get escaped per row
+                fmt = b"%s".join(piece.replace(b"%", b"%%") for piece in pieces[::2])
+                data = (fmt, tuple(used.setdefault(int(piece), len(used)) for piece in pieces[1::2]))
+            parts.append((info, data))
+    return [keys[i] for i in used], parts
 
-if "Certificate No." not in headers:
-    raise ValueError("Excel must contain a column named 'Certificate No.'")
+# ---------------- GENERATION ----------------
+_TEMPLATE = None
+_TEMPLATE_BYTES = None
+
+def _init_worker(template, template_bytes):
+    global _TEMPLATE, _TEMPLATE_BYTES
+    _TEMPLATE = template
+    _TEMPLATE_BYTES = template_bytes
+
+def _new_pool():
+    """Start the worker pool; leave a CPU for the UI, and stay within Windows' limit of 61 processes."""
+    return ProcessPoolExecutor(max_workers=min(max(1, (os.cpu_count() or 2) - 1), 61),
+                               initializer=_init_worker,
+                               initargs=(template, None if template else template_bytes))
+
+def _render_one(output_file, cert_no, mapping):
+    """Worker: fill one certificate from the template. Returns (cert_no, error title, error message)."""
+    if _TEMPLATE is not None:
+        keys, parts = _TEMPLATE
+        values = [_xml_text(mapping.get(key, "")) for key in keys]
+        try:
+            with zipfile.ZipFile(output_file, "w") as zout:
+                for info, data in parts:
+                    if isinstance(data, tuple):
+                        fmt, slots = data
+                        data = fmt % tuple(values[i] for i in slots)
+                    zout.writestr(info, data, compresslevel=ZIP_COMPRESSLEVEL)
+        except Exception as e:
+            return cert_no, "Save error", f"Could not save {output_file}: {e}"
+        return cert_no, None, None
 
-certno_index = headers.index("Certificate No.")
-name_index = headers.index("name") if "name" in headers else None
+    # Fallback: template could not be precompiled, fill it through python-docx
+    try:
+        doc = Document(template_path if _TEMPLATE_BYTES is None else io.BytesIO(_TEMPLATE_BYTES))
+    except Exception as e:
+        return cert_no, "File error", f"Error with template for {cert_no}: {e}"
+    process_document(doc, mapping)
+    try:
+        doc.save(output_file)
+    except Exception as e:
+        return cert_no, "Save error", f"Could not save {output_file}: {e}"
+    return cert_no, None, None
 
-cert_data = []
-for row in sheet.iter_rows(min_row=2, values_only=True):
-    cert_val = row[certno_index]
-    if not cert_val:
-        continue
-    cert_no = str(cert_val).strip()
-    name = ""
-    if name_index is not None and row[name_index]:
-        name = str(row[name_index]).strip()
-    cert_data.append((cert_no, name, row))
+# Progress/error events from the collector thread, drained on the Tk thread by _poll()
+_events = queue.Queue()
 
-# ---------------- GENERATION ----------------
-def generate_certificates(records):
+def _collect(indexes):
+    """Runs off the Tk thread: submit every certificate and report each result through _events."""
+    global executor
     count = 0
-    for cert_no, name, row in records:
-        output_file = os.path.join(output_dir, f"{cert_no}_{name}.docx")
-        try:
-            shutil.copy2(template_path, output_file)
-            doc = Document(output_file)
-        except Exception as e:
-            messagebox.showerror("File error", f"Error with template for {cert_no}: {e}")
-            continue
-        mapping = {}
-        for i, h in enumerate(headers):
-            key = str(h).strip() if h else ""
-            val = row[i] if i < len(row) else None
-            mapping[key] = format_value(val)
-        process_document(doc, mapping)
-        try:
-            doc.save(output_file)
-            count += 1
-        except Exception as e:
-            messagebox.showerror("Save error", f"Could not save {output_file}: {e}")
-    messagebox.showinfo("Done", f"Generated {count} certificate(s).")
+    try:
+        # Output file -> record. Records sharing a file name would write it at once
+        # on the pool; keeping the last one gives what serial generation left behind
+        jobs = {}
+        for i in indexes:
+            cert_no, name = cert_data[i]
+            jobs[os.path.join(output_dir, f"{cert_no}_{name}.docx")] = i
+        _events.put(("total", len(jobs)))
+
+        futures = []
+        for output_file, i in jobs.items():
+            mapping = dict(zip(headers, [col[i] for col in columns]))
+            futures.append(executor.submit(_render_one, output_file, cert_data[i][0], mapping))
+
+        for done, fut in enumerate(as_completed(futures), start=1):
+            cert_no, err_title, err_msg = fut.result()
+            if err_title:
+                _events.put(("error", err_title, err_msg))
+            else:
+                count += 1
+            _events.put(("progress", done))
+    except BrokenProcessPool as e:
+        # A worker died (killed, out of memory) and the pool refuses all further work;
+        # replace it so the next run does not fail too
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = _new_pool()
+        _events.put(("error", "Generation error", str(e)))
+    except Exception as e:
+        _events.put(("error", "Generation error", str(e)))
+    finally:
+        _events.put(("done", count))
+
+def _poll():
+    try:
+        while True:
+            event = _events.get_nowait()
+            if event[0] == "total":
+                progress["maximum"] = max(event[1], 1)
+            elif event[0] == "progress":
+                progress["value"] = event[1]
+            elif event[0] == "error":
+                messagebox.showerror(event[1], event[2])
+            elif event[0] == "done":
+                for btn in generate_buttons:
+                    btn.state(["!disabled"])
+                messagebox.showinfo("Done", f"Generated {event[1]} certificate(s).")
+                return
+    except queue.Empty:
+        pass
+    root.after(100, _poll)
+
+def generate_certificates(indexes):
+    """Generate the certificates at these positions in cert_data."""
+    for btn in generate_buttons:
+        btn.state(["disabled"])
+    progress["maximum"] = max(len(indexes), 1)
+    progress["value"] = 0
+    threading.Thread(target=_collect, args=(indexes,), daemon=True).start()
+    root.after(100, _poll)
 
 # ---------------- UI ----------------
 def on_mode_change(event=None):
@@ -210,12 +331,8 @@ def generate():
         if not cert_no:
             messagebox.showwarning("Input needed", "Please enter a Certificate No.")
             return
-        match = None
-        for c_no, name, row in cert_data:
-            if c_no == cert_no:
-                match = (c_no, name, row)
-                break
-        if not match:
+        match = CERT_INDEX.get(cert_no)
+        if match is None:
             messagebox.showerror("Not found", f"Certificate No. {cert_no} not found in Excel.")
             return
         generate_certificates([match])
@@ -225,11 +342,10 @@ def generate():
         if not selected_indices:
             messagebox.showwarning("No selection", "Please select at least one certificate.")
             return
-        selected = [cert_data[int(idx)] for idx in selected_indices]
-        generate_certificates(selected)
+        generate_certificates([int(idx) for idx in selected_indices])
 
     elif choice == "All Certificates":
-        generate_certificates(cert_data)
+        generate_certificates(range(len(cert_data)))
 
 from PIL import Image, ImageTk
 
@@ -268,63 +384,123 @@ Metcalfe House, Civil Lines Delhi – 110054"""
             
     
 
-# ---------------- UI ----------------
-root = tk.Tk()
-root.title("Certificate Generator")
-root.geometry("450x400")
-root.resizable(False, False)
-
-if image_path and os.path.exists(image_path):
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    # ---------------- DATA LOADING ----------------
+    wb = load_workbook(excel_path, data_only=True, read_only=True)
+    sheet = wb.active
+    # Read-only mode trusts the sheet's stored dimension, which can be stale; scan instead
+    sheet.reset_dimensions()
+    header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    headers = [str(val).strip() if val else "" for val in header_row]
+
+    if "Certificate No." not in headers:
+        raise ValueError("Excel must contain a column named 'Certificate No.'")
+
+    certno_index = headers.index("Certificate No.")
+    name_index = headers.index("name") if "name" in headers else None
+
+    # Structure of arrays: (cert_no, name) per certificate, plus one list of
+    # formatted values per column, indexed by the certificate's position
+    cert_data = []
+    columns = [[] for _ in headers]
+    # Only the header columns; read-only rows come back padded to exactly max_col values
+    for row in sheet.iter_rows(min_row=2, max_col=len(headers), values_only=True):
+        cert_val = row[certno_index]
+        if not cert_val:
+            continue
+        cert_no = str(cert_val).strip()
+        name = ""
+        if name_index is not None and row[name_index]:
+            name = str(row[name_index]).strip()
+        cert_data.append((cert_no, name))
+        # Format every cell once here; generation only picks these strings up
+        for col, val in zip(columns, row):
+            col.append(format_value(val))
+    wb.close()
+
+    # Certificate No. -> position in cert_data; the first row wins on duplicates
+    CERT_INDEX = {}
+    for i, (cert_no, _) in enumerate(cert_data):
+        CERT_INDEX.setdefault(cert_no, i)
+
+    # Read the template once; workers get it precompiled, or as bytes to clone if that fails
+    template = template_bytes = None
     try:
-        img = Image.open(image_path)
-        photo = ImageTk.PhotoImage(img)
-        root.iconphoto(True, photo)
+        with open(template_path, "rb") as f:
+            template_bytes = f.read()
+        template = compile_template(template_bytes, list(dict.fromkeys(headers)))
     except Exception as e:
-        print(f"Could not set window icon: {e}")
-        
-# Mode selection
-mode_var = tk.StringVar(value="Single Certificate")
-tk.Label(root, text="Choose Mode:").pack(pady=4)
-mode_combo = ttk.Combobox(root, textvariable=mode_var, state="readonly",
-                          values=["Single Certificate", "Selected Certificates", "All Certificates"])
-mode_combo.pack(pady=4)
-mode_combo.bind("<<ComboboxSelected>>", on_mode_change)
-
-# --- Single Certificate Frame ---
-frame_single = tk.Frame(root)
-tk.Label(frame_single, text="Enter Certificate No.:").pack(pady=4)
-entry_single = tk.Entry(frame_single, width=15)
-entry_single.pack(pady=4)
-btn_single = ttk.Button(frame_single, text="Generate Certificate", command=generate)
-btn_single.pack(pady=6)
-add_footer_image(frame_single)
-
-# --- Selected Certificates Frame ---
-frame_selected = tk.Frame(root)
-list_frame = tk.Frame(frame_selected)
-list_frame.pack(pady=6, fill=tk.BOTH, expand=True)
-
-scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL)
-listbox = tk.Listbox(list_frame, selectmode=tk.MULTIPLE, width=30, height=8, yscrollcommand=scrollbar.set)
-scrollbar.config(command=listbox.yview)
-listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-# Populate listbox
-for cert_no, name, _ in cert_data:
-    display = f"{cert_no} - {name}" if name else cert_no
-    listbox.insert(tk.END, display)
-
-btn_selected = ttk.Button(frame_selected, text="Generate Certificates", command=generate)
-btn_selected.pack(pady=6)
-add_footer_image(frame_selected)
-
-# --- All Certificates Frame ---
-frame_all = tk.Frame(root)
-btn_all = ttk.Button(frame_all, text="Generate All Certificates", command=generate)
-btn_all.pack(pady=10)
-add_footer_image(frame_all)
-
-# Initialize view
-on_mode_change()
-root.mainloop()
+        print(f"Could not precompile template, using python-docx per certificate: {e}")
+
+    # One pool for the whole session so worker start-up is paid once
+    executor = _new_pool()
+
+    # ---------------- UI ----------------
+    root = tk.Tk()
+    root.title("Certificate Generator")
+    root.geometry("450x400")
+    root.resizable(False, False)
+
+    if image_path and os.path.exists(image_path):
+        try:
+            img = Image.open(image_path)
+            photo = ImageTk.PhotoImage(img)
+            root.iconphoto(True, photo)
+        except Exception as e:
+            print(f"Could not set window icon: {e}")
+
+    # Mode selection
+    mode_var = tk.StringVar(value="Single Certificate")
+    tk.Label(root, text="Choose Mode:").pack(pady=4)
+    mode_combo = ttk.Combobox(root, textvariable=mode_var, state="readonly",
+                              values=["Single Certificate", "Selected Certificates", "All Certificates"])
+    mode_combo.pack(pady=4)
+    mode_combo.bind("<<ComboboxSelected>>", on_mode_change)
+
+    # --- Single Certificate Frame ---
+    frame_single = tk.Frame(root)
+    tk.Label(frame_single, text="Enter Certificate No.:").pack(pady=4)
+    entry_single = tk.Entry(frame_single, width=15)
+    entry_single.pack(pady=4)
+    btn_single = ttk.Button(frame_single, text="Generate Certificate", command=generate)
+    btn_single.pack(pady=6)
+    add_footer_image(frame_single)
+
+    # --- Selected Certificates Frame ---
+    frame_selected = tk.Frame(root)
+    list_frame = tk.Frame(frame_selected)
+    list_frame.pack(pady=6, fill=tk.BOTH, expand=True)
+
+    scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL)
+    listbox = tk.Listbox(list_frame, selectmode=tk.MULTIPLE, width=30, height=8, yscrollcommand=scrollbar.set)
+    scrollbar.config(command=listbox.yview)
+    listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Populate listbox in one Tcl call
+    listbox.insert(tk.END, *[f"{cert_no} - {name}" if name else cert_no for cert_no, name in cert_data])
+
+    btn_selected = ttk.Button(frame_selected, text="Generate Certificates", command=generate)
+    btn_selected.pack(pady=6)
+    add_footer_image(frame_selected)
+
+    # --- All Certificates Frame ---
+    frame_all = tk.Frame(root)
+    btn_all = ttk.Button(frame_all, text="Generate All Certificates", command=generate)
+    btn_all.pack(pady=10)
+    generate_buttons = [btn_single, btn_selected, btn_all]
+    add_footer_image(frame_all)
+
+    # Progress of the current generation run
+    progress = ttk.Progressbar(root, mode="determinate", length=200)
+    progress.pack(side=tk.BOTTOM, pady=6)
+
+    # Initialize view
+    on_mode_change()
+    try:
+        root.mainloop()
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -1,13 +1,22 @@
 import os
-import shutil
+import io
 import re
+import copy
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape as xml_escape
 from docx import Document
+from docx.oxml.ns import qn
 from openpyxl import load_workbook
 
 # ---------------- CONFIG ----------------
 TEMPLATE_FILENAME = "certificate.docx"
 EXCEL_FILENAME = "internship_details.xlsx"
 OUTPUT_DIRNAME = "certificates"
+# Deflate level for generated .docx files. 1 takes far less CPU than zlib's default (6);
+# files come out larger (~40% for a text-only template), still only tens of KB
+ZIP_COMPRESSLEVEL = 1
 
 # Paths relative to current directory
 current_directory = os.getcwd()
@@ -22,46 +31,27 @@ os.makedirs(output_dir, exist_ok=True)
 PLACEHOLDER_RE = re.compile(r'\{\s*([^}]+?)\s*\}')
 
 def copy_formatting(target_run, source_run):
-    """Copy simple formatting from one run to another."""
-    try:
-        target_run.bold = source_run.bold
-        target_run.italic = source_run.italic
-        target_run.underline = source_run.underline
-    except Exception:
-        pass
-    try:
-        if source_run.font.name:
-            target_run.font.name = source_run.font.name
-    except Exception:
-        pass
-    try:
-        if source_run.font.size:
-            target_run.font.size = source_run.font.size
-    except Exception:
-        pass
-    try:
-        if source_run.font.color and source_run.font.color.rgb:
-            target_run.font.color.rgb = source_run.font.color.rgb
-    except Exception:
-        pass
+    """Copy formatting from one run to another."""
+    # Clone the whole <w:rPr> in one go instead of going property by property
+    src_rPr = source_run._r.find(qn("w:rPr"))
+    if src_rPr is not None:
+        old = target_run._r.find(qn("w:rPr"))
+        if old is not None:
+            target_run._r.remove(old)
+        target_run._r.insert(0, copy.deepcopy(src_rPr))
 
 def replace_placeholders_in_paragraph(paragraph, mapping):
     """Replace placeholders {Key} with values (bold) in a paragraph."""
-    if not paragraph.runs:
-        return
-    full_text = ''.join(run.text for run in paragraph.runs)
-    if "{" not in full_text:
+    # paragraph.runs is an XPath query each time, so take it once; most paragraphs have no "{"
+    runs = paragraph.runs
+    if not any("{" in run.text for run in runs):
         return
+    texts = [run.text for run in runs]
+    full_text = ''.join(texts)
     matches = list(PLACEHOLDER_RE.finditer(full_text))
     if not matches:
         return
 
-    # Build run_map: for each char position, which run index it came from
-    run_map = []
-    for idx, run in enumerate(paragraph.runs):
-        text = run.text or ""
-        run_map.extend([idx] * len(text))
-
     # Segments: (type, text, pos)
     segments = []
     last = 0
@@ -79,16 +69,18 @@ def replace_placeholders_in_paragraph(paragraph, mapping):
         segments.append(("text", full_text[last:], last))
 
     # Clear old runs
-    for run in paragraph.runs:
+    for run in runs:
         run.text = ""
 
-    # Insert new runs
+    # Insert new runs; segments come in text order, so the source run is found
+    # by walking the runs alongside them (run_end is where runs[src_idx] stops)
+    src_idx, run_end = 0, len(texts[0])
     for seg_type, seg_text, seg_pos in segments:
-        if run_map:
-            src_idx = run_map[min(seg_pos, len(run_map) - 1)]
-            src_run = paragraph.runs[src_idx]
-        else:
-            src_run = None
+        pos = min(seg_pos, len(full_text) - 1)
+        while pos >= run_end:
+            src_idx += 1
+            run_end += len(texts[src_idx])
+        src_run = runs[src_idx]
 
         new_run = paragraph.add_run(seg_text)
         if src_run:
@@ -96,79 +88,165 @@ def replace_placeholders_in_paragraph(paragraph, mapping):
         if seg_type == "replace":
             new_run.bold = True
 
-def process_document(doc, mapping):
-    """Replace placeholders everywhere in the document."""
+def iter_paragraphs(doc):
+    """Yield every paragraph: body, tables, headers & footers."""
     # Paragraphs
-    for p in doc.paragraphs:
-        replace_placeholders_in_paragraph(p, mapping)
+    yield from doc.paragraphs
 
     # Tables
     for table in doc.tables:
         for row in table.rows:
             for cell in row.cells:
-                for p in cell.paragraphs:
-                    replace_placeholders_in_paragraph(p, mapping)
+                yield from cell.paragraphs
 
     # Headers & Footers
     for section in doc.sections:
         for container in (section.header, section.footer):
-            if container:
-                for p in container.paragraphs:
-                    replace_placeholders_in_paragraph(p, mapping)
+            # Linked means no part of its own: reading it would create an empty one per document
+            if not container.is_linked_to_previous:
+                yield from container.paragraphs
                 for table in container.tables:
                     for row in table.rows:
                         for cell in row.cells:
-                            for p in cell.paragraphs:
-                                replace_placeholders_in_paragraph(p, mapping)
+                            yield from cell.paragraphs
 
-# ---------------- MAIN ----------------
+def process_document(doc, mapping):
+    """Replace placeholders everywhere in the document."""
+    for p in iter_paragraphs(doc):
+        replace_placeholders_in_paragraph(p, mapping)
 
-# Load Excel
-wb = load_workbook(excel_path, data_only=True)
-sheet = wb.active
-headers = [str(cell.value).strip() if cell.value else "" for cell in sheet[1]]
+# Private-use code points that mark value slots in the precompiled template
+_MARK_OPEN, _MARK_CLOSE = "\ue000", "\ue001"
+_MARK_RE = re.compile(re.escape(_MARK_OPEN.encode()) + rb"(\d+)" + re.escape(_MARK_CLOSE.encode()))
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _xml_text(value):
+    """Escape a value for a <w:t> slot; tabs and line breaks become <w:tab/>/<w:br/> like python-docx does."""
+    text = xml_escape(_XML_INVALID_RE.sub("", value))
+    if "\t" in text or "\n" in text or "\r" in text:
+        text = (text.replace("\t", '</w:t><w:tab/><w:t xml:space="preserve">')
+                    .replace("\r", '</w:t><w:br/><w:t xml:space="preserve">')
+                    .replace("\n", '</w:t><w:br/><w:t xml:space="preserve">'))
+    return text.encode("utf-8")
+
+def compile_template(template_bytes, keys):
+    """Fill the template once with slot markers instead of values.
+
+    Returns (keys, parts): the keys the template actually uses, and a list of
+    (ZipInfo, data) where data is either the member bytes or, for members holding
+    placeholders, a (format, slots) pair: the member as a bytes %-format and the
+    index into keys for each %s. Rendering a row is then one % plus a zip write,
+    with no XML parsing.
+    Returns None if the template itself contains the marker characters.
+    """
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as zin:
+        if any(_MARK_OPEN.encode() in zin.read(info) for info in zin.infolist()):
+            return None
+    doc = Document(io.BytesIO(template_bytes))
+    process_document(doc, {key: f"{_MARK_OPEN}{i}{_MARK_CLOSE}" for i, key in enumerate(keys)})
+    buf = io.BytesIO()
+    doc.save(buf)
+
+    parts = []
+    used = {}
+    with zipfile.ZipFile(buf) as zin:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if _MARK_OPEN.encode() in data:
+                pieces = _MARK_RE.split(data.replace(b"<w:t>" + _MARK_OPEN.encode(),
+                                                     b'<w:t xml:space="preserve">' + _MARK_OPEN.encode()))
+                # Literal XML becomes a %-format (its own % doubled) with a %s per slot;
+                # slots are renumbered so only keys the template uses get escaped per row
+                fmt = b"%s".join(piece.replace(b"%", b"%%") for piece in pieces[::2])
+                data = (fmt, tuple(used.setdefault(int(piece), len(used)) for piece in pieces[1::2]))
+            parts.append((info, data))
+    return [keys[i] for i in used], parts
+
+# ---------------- GENERATION ----------------
+_TEMPLATE = None
+_TEMPLATE_BYTES = None
+
+def _init_worker(template, template_bytes):
+    global _TEMPLATE, _TEMPLATE_BYTES
+    _TEMPLATE = template
+    _TEMPLATE_BYTES = template_bytes
+
+def _render_one(output_file, mapping):
+    """Worker: fill one certificate from the template and save it."""
+    if _TEMPLATE is not None:
+        keys, parts = _TEMPLATE
+        values = [_xml_text(mapping.get(key, "")) for key in keys]
+        with zipfile.ZipFile(output_file, "w") as zout:
+            for info, data in parts:
+                if isinstance(data, tuple):
+                    fmt, slots = data
+                    data = fmt % tuple(values[i] for i in slots)
+                zout.writestr(info, data, compresslevel=ZIP_COMPRESSLEVEL)
+        return output_file
+
+    # Fallback: template could not be precompiled, fill it through python-docx
+    doc = Document(io.BytesIO(_TEMPLATE_BYTES))
+    process_document(doc, mapping)
+    doc.save(output_file)
+    return output_file
 
-# Find Sl.No column (fallback to first column)
-try:
-    slno_index = headers.index("Sl.No")
-except ValueError:
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    # Load Excel
+    wb = load_workbook(excel_path, data_only=True, read_only=True)
+    sheet = wb.active
+    # Read-only mode trusts the sheet's stored dimension, which can be stale; scan instead
+    sheet.reset_dimensions()
+    header_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    headers = [str(val).strip() if val else "" for val in header_row]
+
+    # Find Sl.No column (fallback to first column)
     try:
-        slno_index = headers.index("Sl No")
+        slno_index = headers.index("Sl.No")
     except ValueError:
-        slno_index = 0
-
-for row_idx, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-    sl = row[slno_index]
-    if not sl or str(sl).strip() == "":
-        print(f"Skipping row {row_idx} (empty Sl.No)")
-        continue
-
-    slno = str(sl).strip()
-    output_file = os.path.join(output_dir, f"{slno}.docx")
-
-    # Copy template
-    shutil.copy2(template_path, output_file)
-    doc = Document(output_file)
-
-    # Build mapping (exclude Sl.No)
-    mapping = {}
-    for i, h in enumerate(headers):
-        key = str(h).strip() if h else ""
-        if key == "Sl.No" or key == "Sl No":
+        try:
+            slno_index = headers.index("Sl No")
+        except ValueError:
+            slno_index = 0
+
+    # Columns that go into the mapping (everything but Sl.No), worked out once
+    mapping_cols = [(i, h) for i, h in enumerate(headers) if h not in ("Sl.No", "Sl No")]
+
+    # Same template for every row: read and precompile it once
+    with open(template_path, "rb") as f:
+        template_bytes = f.read()
+    template = compile_template(template_bytes, list(dict.fromkeys(h for _, h in mapping_cols)))
+
+    # Output file -> mapping. Rows sharing an Sl.No would write the same file at once
+    # on the pool; keeping the last one gives what the old serial loop left behind
+    jobs = {}
+    for row_idx, row in enumerate(sheet.iter_rows(min_row=2, max_col=len(headers), values_only=True), start=2):
+        sl = row[slno_index]
+        if not sl or str(sl).strip() == "":
+            print(f"Skipping row {row_idx} (empty Sl.No)")
             continue
-        val = row[i] if i < len(row) else None
-        mapping[key] = "" if val is None else str(val)
 
-    # Debug print
-    print(f"\nRow {row_idx} -> Sl.No {slno} mapping:")
-    for k, v in mapping.items():
-        print(f"  {k} -> {v}")
+        slno = str(sl).strip()
+        output_file = os.path.join(output_dir, f"{slno}.docx")
 
-    # Replace placeholders
-    process_document(doc, mapping)
+        # Build mapping (exclude Sl.No)
+        mapping = {h: "" if row[i] is None else str(row[i]) for i, h in mapping_cols}
 
-    # Save
-    doc.save(output_file)
-    print(f"Generated: {output_file}")
+        # Debug print
+        print(f"\nRow {row_idx} -> Sl.No {slno} mapping:")
+        for k, v in mapping.items():
+            print(f"  {k} -> {v}")
+
+        jobs[output_file] = mapping
+    wb.close()
+
+    # Rows are independent: fill and save them on a process pool, in chunks to cut IPC.
+    # max_workers=None is one per CPU, capped at Windows' limit of 61
+    with ProcessPoolExecutor(max_workers=None, initializer=_init_worker,
+                             initargs=(template, None if template else template_bytes)) as executor:
+        for output_file in executor.map(_render_one, jobs.keys(), jobs.values(), chunksize=8):
+            print(f"Generated: {output_file}")
 
-print("\nAll certificates generated successfully!")
+    print("\nAll certificates generated successfully!")